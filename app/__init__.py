@@ -9,10 +9,12 @@ login_manager = LoginManager()
 login_manager.login_view = 'main.login'
 login_manager.login_message_category = 'warning'
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///inventory.db'
     app.config['SECRET_KEY'] = 'supersecretkey'  # change this in production!
+    if config:
+        app.config.update(config)
 
     db.init_app(app)
     migrate.init_app(app, db)
@@ -31,4 +33,8 @@ def create_app():
     from .routes import main_bp
     app.register_blueprint(main_bp)
 
+    # 🔹 Register CLI commands (flask planning ...)
+    from .cli import planning_cli
+    app.cli.add_command(planning_cli)
+
     return app
@@ -0,0 +1,83 @@
+import json
+import time
+
+import click
+from flask.cli import AppGroup
+
+from .models import MAX_QTY
+from .stock_engine import stock_engine
+
+planning_cli = AppGroup('planning', help='Replenishment and what-if queries on the in-memory stock matrix.')
+
+
+def _load():
+    start = time.perf_counter()
+    stock_engine.sync()
+    click.echo(f'Loaded {len(stock_engine.product_ids)} products x {len(stock_engine.location_ids)} locations '
+               f'in {(time.perf_counter() - start) * 1000:.1f} ms', err=True)
+
+
+@planning_cli.command('reorder')
+@click.option('--location', 'locations', multiple=True, help='Restrict to a location id (repeatable).')
+@click.option('--limit', default=50, show_default=True, help='Maximum rows to print.')
+def reorder(locations, limit):
+    """List product/location balances below their reorder point."""
+    _load()
+    start = time.perf_counter()
+    total, rows = stock_engine.below_reorder(list(locations) or None, limit=limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    for r in rows:
+        click.echo(f"{r['product_id']}\t{r['location_id']}\t{r['qty']}\t{r['reorder_point']}")
+    click.echo(f'{total} below reorder point ({elapsed:.1f} ms)', err=True)
+
+
+@planning_cli.command('shortages')
+@click.option('-n', default=20, show_default=True, help='Number of shortages to show.')
+@click.option('--location', 'locations', multiple=True, help='Restrict to a location id (repeatable).')
+def shortages(n, locations):
+    """Show the N largest shortages below reorder point."""
+    _load()
+    start = time.perf_counter()
+    rows = stock_engine.top_shortages(n, list(locations) or None)
+    elapsed = (time.perf_counter() - start) * 1000
+    for r in rows:
+        click.echo(f"{r['product_id']}\t{r['location_id']}\t{r['qty']}\t{r['reorder_point']}\t{r['shortage']}")
+    click.echo(f'{len(rows)} shortages ({elapsed:.1f} ms)', err=True)
+
+
+@planning_cli.command('simulate')
+@click.argument('batch', type=click.File('r'))
+def simulate(batch):
+    """Simulate a JSON list of transfers without recording them.
+
+    Each entry is {"product_id", "from_location", "to_location", "qty"}; use - to read stdin.
+    """
+    try:
+        entries = json.load(batch)
+    except ValueError as e:
+        raise click.BadParameter(f'invalid JSON: {e}', param_hint='BATCH')
+    if not isinstance(entries, list):
+        raise click.BadParameter('expected a JSON list of transfers', param_hint='BATCH')
+
+    transfers = []
+    for n, t in enumerate(entries, start=1):
+        if not isinstance(t, dict):
+            raise click.BadParameter(f'transfer {n}: expected a JSON object', param_hint='BATCH')
+        product_id, from_loc, to_loc, qty = (
+            t.get('product_id'), t.get('from_location') or None, t.get('to_location') or None, t.get('qty')
+        )
+        if not isinstance(product_id, str) or not all(l is None or isinstance(l, str) for l in (from_loc, to_loc)):
+            raise click.BadParameter(f'transfer {n}: product_id must be a string, locations a string or null',
+                                     param_hint='BATCH')
+        if not isinstance(qty, int) or isinstance(qty, bool) or not 1 <= qty <= MAX_QTY:
+            raise click.BadParameter(f'transfer {n}: qty must be an integer from 1 to {MAX_QTY}', param_hint='BATCH')
+        transfers.append((product_id, from_loc, to_loc, qty))
+
+    _load()
+    try:
+        cells = stock_engine.simulate(transfers)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for c in cells:
+        flags = ('NEGATIVE' if c['negative'] else '') or ('BELOW REORDER' if c['below_reorder'] else '')
+        click.echo(f"{c['product_id']}\t{c['location_id']}\t{c['before']} -> {c['after']}\t{flags}".rstrip())
@@ -1,12 +1,14 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, SubmitField, IntegerField, SelectField, PasswordField
-from wtforms.validators import DataRequired, NumberRange, Optional, Length
+from wtforms.validators import DataRequired, NumberRange, Optional, Length, ValidationError
+from .models import MAX_QTY
 
 
 class ProductForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     description = TextAreaField('Description', validators=[Optional()])
     qty = IntegerField('Quantity', validators=[NumberRange(min=0)], default=0)
+    reorder_point = IntegerField('Reorder Point', validators=[Optional(), NumberRange(min=0, max=MAX_QTY)], default=0)
     submit = SubmitField('Save')
 
 
@@ -24,6 +26,35 @@ class MovementForm(FlaskForm):
     submit = SubmitField('Save')
 
 
+class TransferForm(FlaskForm):
+    from_location = SelectField('From Location (leave blank for inbound)', coerce=str, validators=[Optional()])
+    to_location = SelectField('To Location (leave blank for outbound)', coerce=str, validators=[Optional()])
+    reference = StringField('Reference', validators=[Optional(), Length(max=120)])
+    lines = TextAreaField('Lines (one "product_id, qty" per line)', validators=[DataRequired()])
+    submit = SubmitField('Save')
+
+    def validate_lines(self, field):
+        """Parse the pasted lines into (product_id, qty) pairs on self.parsed_lines."""
+        parsed = []
+        for n, raw in enumerate(field.data.splitlines(), start=1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            parts = raw.replace(',', ' ').replace(';', ' ').split()
+            if len(parts) != 2:
+                raise ValidationError(f'Line {n}: expected "product_id, qty"')
+            try:
+                qty = int(parts[1])
+            except ValueError:
+                raise ValidationError(f'Line {n}: quantity must be a whole number')
+            if not 1 <= qty <= MAX_QTY:
+                raise ValidationError(f'Line {n}: quantity must be between 1 and {MAX_QTY}')
+            parsed.append((parts[0], qty))
+        if not parsed:
+            raise ValidationError('Please enter at least one line')
+        self.parsed_lines = parsed
+
+
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
     password = PasswordField('Password', validators=[DataRequired(), Length(min=4)])
@@ -1,10 +1,14 @@
 from app import db
 from datetime import datetime
 import uuid
+from sqlalchemy import DDL, event
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
 
+MAX_QTY = 2**31 - 1  # largest quantity a 32-bit integer column can hold
+
+
 def gen_id():
     """Generate short UUIDs for locations and movements"""
     return str(uuid.uuid4())[:8]
@@ -15,13 +19,17 @@ def gen_id():
 # -----------------------
 class Product(db.Model):
     __tablename__ = 'product'
+    __table_args__ = (
+        db.CheckConstraint(f'reorder_point BETWEEN 0 AND {MAX_QTY}', name='ck_product_reorder_point'),
+    )
 
     product_id = db.Column(db.String(10), primary_key=True)  # e.g., PI001
     name = db.Column(db.String(120), nullable=False)
     description = db.Column(db.String(255))
     qty = db.Column(db.Integer, default=0)
+    reorder_point = db.Column(db.Integer, nullable=False, default=0)
 
-    def __init__(self, name, description=None, qty=0):
+    def __init__(self, name, description=None, qty=0, reorder_point=0):
         # Auto-generate product_id like PI001, PI002, etc.
         last_product = Product.query.order_by(Product.product_id.desc()).first()
         if last_product and last_product.product_id.startswith("PI"):
@@ -34,6 +42,7 @@ class Product(db.Model):
         self.name = name
         self.description = description
         self.qty = qty
+        self.reorder_point = reorder_point
 
     def __repr__(self):
         return f'<Product {self.product_id} - {self.name}>'
@@ -65,6 +74,7 @@ class ProductMovement(db.Model):
     to_location = db.Column(db.String(32), db.ForeignKey('location.location_id'), nullable=True)
     product_id = db.Column(db.String(10), db.ForeignKey('product.product_id'), nullable=False)
     qty = db.Column(db.Integer, nullable=False)
+    transfer_id = db.Column(db.String(32), db.ForeignKey('transfer.transfer_id'), nullable=True, index=True)
 
     product = db.relationship('Product', foreign_keys=[product_id])
     from_loc = db.relationship('Location', foreign_keys=[from_location])
@@ -74,6 +84,106 @@ class ProductMovement(db.Model):
         return f'<Move {self.product_id} {self.qty} {self.from_location}->{self.to_location}>'
 
 
+# -----------------------
+# Transfer Document Model
+# -----------------------
+class Transfer(db.Model):
+    """Header of a multi-line transfer; each line is a ProductMovement."""
+    __tablename__ = 'transfer'
+
+    transfer_id = db.Column(db.String(32), primary_key=True, default=gen_id)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    from_location = db.Column(db.String(32), db.ForeignKey('location.location_id'), nullable=True)
+    to_location = db.Column(db.String(32), db.ForeignKey('location.location_id'), nullable=True)
+    reference = db.Column(db.String(120))
+
+    from_loc = db.relationship('Location', foreign_keys=[from_location])
+    to_loc = db.relationship('Location', foreign_keys=[to_location])
+    lines = db.relationship('ProductMovement', backref='transfer', lazy='select',
+                            cascade='all, delete-orphan', order_by='ProductMovement.product_id')
+
+    @property
+    def total_qty(self):
+        return sum(line.qty for line in self.lines)
+
+    def __repr__(self):
+        return f'<Transfer {self.transfer_id} {self.from_location}->{self.to_location}>'
+
+
+# -----------------------
+# Stock Change Log Model
+# -----------------------
+class StockLog(db.Model):
+    """Append-only log of stock changes, written by the triggers below.
+
+    The planning engine replays rows past the last log_id it has seen; a
+    deleted movement is logged as a 'reversal' of the same values. log_id is AUTOINCREMENT, so ids are never reused after deletes or
+    VACUUM. The first row of a new table is an 'epoch' row with a random
+    token, which tells a recreated table apart from the one it replaced.
+    """
+    __tablename__ = 'stock_log'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    log_id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # epoch, movement, reversal, product or location
+    product_id = db.Column(db.String(10))
+    location_id = db.Column(db.String(32))
+    from_location = db.Column(db.String(32))
+    to_location = db.Column(db.String(32))
+    qty = db.Column(db.Integer)
+    reorder_point = db.Column(db.Integer)
+    token = db.Column(db.String(32))
+
+    def __repr__(self):
+        return f'<StockLog {self.log_id} {self.kind}>'
+
+
+STOCK_LOG_TRIGGERS = {
+    'product_movement': [
+        """CREATE TRIGGER stock_log_movement_insert AFTER INSERT ON product_movement BEGIN
+            INSERT INTO stock_log (kind, product_id, from_location, to_location, qty)
+            VALUES ('movement', NEW.product_id, NEW.from_location, NEW.to_location, NEW.qty);
+        END""",
+        """CREATE TRIGGER stock_log_movement_delete AFTER DELETE ON product_movement BEGIN
+            INSERT INTO stock_log (kind, product_id, from_location, to_location, qty)
+            VALUES ('reversal', OLD.product_id, OLD.from_location, OLD.to_location, OLD.qty);
+        END""",
+        """CREATE TRIGGER stock_log_movement_update
+        AFTER UPDATE OF product_id, from_location, to_location, qty ON product_movement BEGIN
+            INSERT INTO stock_log (kind, product_id, from_location, to_location, qty)
+            VALUES ('reversal', OLD.product_id, OLD.from_location, OLD.to_location, OLD.qty);
+            INSERT INTO stock_log (kind, product_id, from_location, to_location, qty)
+            VALUES ('movement', NEW.product_id, NEW.from_location, NEW.to_location, NEW.qty);
+        END""",
+    ],
+    'product': [
+        """CREATE TRIGGER stock_log_product_insert AFTER INSERT ON product BEGIN
+            INSERT INTO stock_log (kind, product_id, reorder_point)
+            VALUES ('product', NEW.product_id, NEW.reorder_point);
+        END""",
+        """CREATE TRIGGER stock_log_product_update AFTER UPDATE OF reorder_point ON product BEGIN
+            INSERT INTO stock_log (kind, product_id, reorder_point)
+            VALUES ('product', NEW.product_id, NEW.reorder_point);
+        END""",
+        """CREATE TRIGGER stock_log_product_delete AFTER DELETE ON product BEGIN
+            INSERT INTO stock_log (kind, product_id, reorder_point) VALUES ('product', OLD.product_id, 0);
+        END""",
+    ],
+    'location': [
+        """CREATE TRIGGER stock_log_location_insert AFTER INSERT ON location BEGIN
+            INSERT INTO stock_log (kind, location_id) VALUES ('location', NEW.location_id);
+        END""",
+    ],
+    'stock_log': [
+        "INSERT INTO stock_log (kind, token) VALUES ('epoch', lower(hex(randomblob(16))))",
+    ],
+}
+
+for _table in (Product, Location, ProductMovement, StockLog):
+    for _statement in STOCK_LOG_TRIGGERS[_table.__tablename__]:
+        event.listen(_table.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+
 # -----------------------
 # User Model
 # -----------------------
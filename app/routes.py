@@ -1,9 +1,12 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, Response
-from .models import Product, Location, ProductMovement, User
-from .forms import ProductForm, LocationForm, MovementForm, LoginForm, RegisterForm
+from flask import Blueprint, render_template, redirect, url_for, request, flash, Response, jsonify
+from .models import Product, Location, ProductMovement, Transfer, User, gen_id, MAX_QTY
+from .forms import ProductForm, LocationForm, MovementForm, TransferForm, LoginForm, RegisterForm
 from . import db
+from .stock_engine import stock_engine
 from flask_login import login_user, logout_user, login_required, current_user
-from sqlalchemy import text
+from sqlalchemy import text, func, case, or_, insert
+from sqlalchemy.orm import selectinload
+from datetime import datetime
 import csv
 from io import StringIO
 
@@ -31,7 +34,8 @@ def product_add():
         new_product = Product(
             name=form.name.data,
             description=form.description.data,
-            qty=form.qty.data or 0
+            qty=form.qty.data or 0,
+            reorder_point=form.reorder_point.data or 0
         )
         db.session.add(new_product)
         db.session.commit()
@@ -50,6 +54,7 @@ def product_edit(product_id):
         product.name = form.name.data
         product.description = form.description.data
         product.qty = form.qty.data
+        product.reorder_point = form.reorder_point.data or 0
         db.session.commit()
         flash(f'Product {product.product_id} updated successfully!', 'success')
         return redirect(url_for('main.product_list'))
@@ -123,8 +128,15 @@ def location_delete(location_id):
 @main_bp.route('/movements')
 @login_required
 def movement_list():
-    moves = ProductMovement.query.order_by(ProductMovement.timestamp.desc()).all()
-    return render_template('movements/list.html', moves=moves)
+    moves = ProductMovement.query.filter(ProductMovement.transfer_id.is_(None)).all()
+    transfers = Transfer.query.options(
+        selectinload(Transfer.lines).joinedload(ProductMovement.product)
+    ).all()
+    # Transfer documents are listed as a single entry next to standalone movements
+    entries = [{'kind': 'move', 'item': m, 'timestamp': m.timestamp} for m in moves]
+    entries += [{'kind': 'transfer', 'item': t, 'timestamp': t.timestamp} for t in transfers]
+    entries.sort(key=lambda e: e['timestamp'], reverse=True)
+    return render_template('movements/list.html', entries=entries)
 
 
 @main_bp.route('/movements/add', methods=['GET', 'POST'])
@@ -170,6 +182,151 @@ def movement_delete(movement_id):
     return redirect(url_for('main.movement_list'))
 
 
+# ========== TRANSFERS ==========
+def _valid_qty(qty):
+    return isinstance(qty, int) and not isinstance(qty, bool) and 1 <= qty <= MAX_QTY
+
+
+def _available_stock(location_id, product_ids):
+    """Current balance of each product at a location, in one aggregate query."""
+    stock = func.sum(case((ProductMovement.to_location == location_id, ProductMovement.qty), else_=0)) - \
+        func.sum(case((ProductMovement.from_location == location_id, ProductMovement.qty), else_=0))
+    rows = db.session.query(ProductMovement.product_id, stock).filter(
+        ProductMovement.product_id.in_(product_ids),
+        or_(ProductMovement.to_location == location_id, ProductMovement.from_location == location_id)
+    ).group_by(ProductMovement.product_id).all()
+    return {pid: int(qty or 0) for pid, qty in rows}
+
+
+def _record_transfer(from_loc, to_loc, reference, lines):
+    """Validate and store a transfer document with all its lines in one commit.
+
+    Returns (transfer, None) on success or (None, error message) on failure.
+    """
+    if not from_loc and not to_loc:
+        return None, 'Please specify a source or destination location'
+    if from_loc == to_loc:
+        return None, 'Source and destination locations must differ'
+
+    # Repeated products are merged into a single line
+    totals = {}
+    for product_id, qty in lines:
+        totals[product_id] = totals.get(product_id, 0) + qty
+    too_large = sorted(pid for pid, qty in totals.items() if qty > MAX_QTY)
+    if too_large:
+        return None, f'Total quantity above {MAX_QTY}: {", ".join(too_large)}'
+
+    location_ids = {l for l in (from_loc, to_loc) if l}
+    if Location.query.filter(Location.location_id.in_(location_ids)).count() != len(location_ids):
+        return None, 'Unknown location'
+
+    known = {pid for (pid,) in db.session.query(Product.product_id).filter(Product.product_id.in_(totals))}
+    unknown = sorted(set(totals) - known)
+    if unknown:
+        return None, f'Unknown product(s): {", ".join(unknown)}'
+
+    if from_loc:
+        # Serialise transfers out of the same location on databases with row locks
+        db.session.query(Location.location_id).filter_by(location_id=from_loc).with_for_update().first()
+
+    transfer = Transfer(from_location=from_loc, to_location=to_loc, reference=reference or None,
+                        timestamp=datetime.utcnow())
+    db.session.add(transfer)
+    db.session.flush()
+    db.session.execute(insert(ProductMovement), [
+        {
+            'movement_id': gen_id(),
+            'timestamp': transfer.timestamp,
+            'from_location': from_loc,
+            'to_location': to_loc,
+            'product_id': pid,
+            'qty': qty,
+            'transfer_id': transfer.transfer_id,
+        }
+        for pid, qty in totals.items()
+    ])
+
+    if from_loc:
+        # Checked after the insert, inside the write transaction, so a concurrent
+        # transfer that committed first is always included in the balance
+        available = _available_stock(from_loc, list(totals))
+        short = [pid for pid in totals if available.get(pid, 0) < 0]
+        if short:
+            db.session.rollback()
+            details = ', '.join(
+                f'{pid} (need {totals[pid]}, have {available.get(pid, 0) + totals[pid]})' for pid in sorted(short)
+            )
+            return None, f'Insufficient stock: {details}'
+
+    db.session.commit()
+    return transfer, None
+
+
+@main_bp.route('/transfers/add', methods=['GET', 'POST'])
+@login_required
+def transfer_add():
+    form = TransferForm()
+    locations = Location.query.order_by(Location.name).all()
+    form.from_location.choices = form.to_location.choices = [('', '---')] + [
+        (l.location_id, l.name) for l in locations
+    ]
+
+    if form.validate_on_submit():
+        transfer, error = _record_transfer(
+            form.from_location.data or None,
+            form.to_location.data or None,
+            form.reference.data,
+            form.parsed_lines
+        )
+        if error:
+            flash(error, 'danger')
+        else:
+            flash(f'Transfer {transfer.transfer_id} recorded with {len(transfer.lines)} line(s)!', 'success')
+            return redirect(url_for('main.movement_list'))
+
+    return render_template('movements/transfer_form.html', form=form, action='Add')
+
+
+@main_bp.route('/api/transfers', methods=['POST'])
+@login_required
+def transfer_api():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('lines'), list) or not data['lines']:
+        return jsonify(error='Expected a JSON object with a non-empty "lines" list'), 400
+
+    lines = []
+    for n, line in enumerate(data['lines'], start=1):
+        product_id = line.get('product_id') if isinstance(line, dict) else None
+        qty = line.get('qty') if isinstance(line, dict) else None
+        if not isinstance(product_id, str) or not _valid_qty(qty):
+            return jsonify(error=f'Line {n}: expected {{"product_id": str, "qty": int from 1 to {MAX_QTY}}}'), 400
+        lines.append((product_id, qty))
+    if not isinstance(data.get('reference') or '', str):
+        return jsonify(error='"reference" must be a string'), 400
+    for key in ('from_location', 'to_location'):
+        if not isinstance(data.get(key) or '', str):
+            return jsonify(error=f'"{key}" must be a string or null'), 400
+
+    transfer, error = _record_transfer(
+        data.get('from_location') or None,
+        data.get('to_location') or None,
+        data.get('reference'),
+        lines
+    )
+    if error:
+        return jsonify(error=error), 400
+    return jsonify(transfer_id=transfer.transfer_id, lines=len(transfer.lines)), 201
+
+
+@main_bp.route('/transfers/delete/<string:transfer_id>', methods=['POST'])
+@login_required
+def transfer_delete(transfer_id):
+    db.session.delete(Transfer.query.get_or_404(transfer_id))
+    db.session.commit()
+    flash('Transfer deleted successfully!', 'success')
+    return redirect(url_for('main.movement_list'))
+
+
 # ========== BALANCE ==========
 @main_bp.route('/balance')
 @login_required
@@ -191,6 +348,59 @@ def balance():
     return render_template('movements/balance.html', rows=rows)
 
 
+# ========== PLANNING ==========
+def _with_names(rows):
+    """Attach product and location names to engine result rows."""
+    product_ids = {r['product_id'] for r in rows}
+    location_ids = {r['location_id'] for r in rows}
+    products = dict(db.session.query(Product.product_id, Product.name).filter(Product.product_id.in_(product_ids)))
+    locations = dict(db.session.query(Location.location_id, Location.name).filter(Location.location_id.in_(location_ids)))
+    for r in rows:
+        r['product'] = products.get(r['product_id'], r['product_id'])
+        r['location'] = locations.get(r['location_id'], r['location_id'])
+    return rows
+
+
+@main_bp.route('/planning')
+@login_required
+def planning():
+    n = request.args.get('n', 25, type=int)
+    location_id = request.args.get('location') or None
+    location_ids = [location_id] if location_id else None
+
+    below_count, shortages = stock_engine.summary(n, location_ids)
+    shortages = _with_names(shortages)
+    locations = Location.query.order_by(Location.name).all()
+    return render_template('movements/planning.html', shortages=shortages, below_count=below_count,
+                           locations=locations, location_id=location_id, n=n)
+
+
+@main_bp.route('/api/planning/simulate', methods=['POST'])
+@login_required
+def planning_simulate():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('transfers'), list):
+        return jsonify(error='Expected a JSON object with a "transfers" list'), 400
+
+    transfers = []
+    for n, t in enumerate(data['transfers'], start=1):
+        if not isinstance(t, dict):
+            return jsonify(error=f'Transfer {n}: expected a JSON object'), 400
+        product_id, from_loc, to_loc = t.get('product_id'), t.get('from_location') or None, t.get('to_location') or None
+        if not isinstance(product_id, str) or not all(l is None or isinstance(l, str) for l in (from_loc, to_loc)):
+            return jsonify(error=f'Transfer {n}: product_id must be a string, locations a string or null'), 400
+        if not _valid_qty(t.get('qty')):
+            return jsonify(error=f'Transfer {n}: qty must be an integer from 1 to {MAX_QTY}'), 400
+        transfers.append((product_id, from_loc, to_loc, t['qty']))
+
+    try:
+        cells = stock_engine.simulate(transfers)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(cells=_with_names(cells), negative=sum(c['negative'] for c in cells),
+                   below_reorder=sum(c['below_reorder'] for c in cells))
+
+
 # ========== AUTH ==========
 @main_bp.route('/login', methods=['GET', 'POST'])
 def login():
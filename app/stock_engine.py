@@ -0,0 +1,352 @@
+import threading
+
+import numpy as np
+from sqlalchemy import func, select, true
+
+from . import db
+from .models import MAX_QTY, Product, Location, ProductMovement, StockLog
+
+INT64_MAX = np.iinfo(np.int64).max
+ROW_CHUNK = 4096  # rows per block when refreshing the per-product caches
+
+
+class StockEngine:
+    """In-memory product x location balance matrix for planning queries.
+
+    Balances are held in a dense int64 matrix whose rows and columns are
+    product and location ordinals, next to per-product caches of the lowest
+    stocked balance and the number of cells under the reorder point, so
+    catalog-wide scans only touch one vector. The matrix is built from the
+    database on first use; before every query `sync()` replays the stock_log
+    rows written since then by any process. The log is filled by database
+    triggers and its ids are never reused, so deletes and VACUUM cannot hide
+    a change.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    # ---------- building ----------
+    def _reset(self):
+        self.loaded = False
+        self.product_ids = []
+        self.location_ids = []
+        self._product_index = {}
+        self._location_index = {}
+        self._balances = np.zeros((0, 0), dtype=np.int64)
+        self._stocked = np.zeros((0, 0), dtype=bool)
+        self._reorder = np.zeros(0, dtype=np.int64)
+        self._row_min = np.zeros(0, dtype=np.int64)
+        self._row_short = np.zeros(0, dtype=np.int64)
+        self._watermark = 0
+        self._epoch = None
+
+    def _current_epoch(self):
+        return db.session.query(StockLog.log_id, StockLog.token).order_by(StockLog.log_id).first()
+
+    def load(self):
+        """(Re)build the matrix from one aggregate query over all movements."""
+        with self._lock:
+            self._reset()
+            self._epoch = self._current_epoch()
+            start = db.session.query(func.coalesce(func.max(StockLog.log_id), 0)).scalar()
+            for (location_id,) in db.session.query(Location.location_id):
+                self._location_ordinal(location_id)
+            products = db.session.query(Product.product_id, Product.reorder_point).all()
+            for product_id, reorder_point in products:
+                self._set_reorder(self._product_ordinal(product_id), reorder_point)
+
+            # One statement reads the log position and the balances from the same snapshot
+            watermark = select(func.coalesce(func.max(StockLog.log_id), 0).label('watermark')).subquery()
+            moves = select(
+                ProductMovement.product_id, ProductMovement.from_location, ProductMovement.to_location,
+                func.sum(ProductMovement.qty).label('qty')
+            ).group_by(
+                ProductMovement.product_id, ProductMovement.from_location, ProductMovement.to_location
+            ).subquery()
+            rows = db.session.execute(
+                select(watermark.c.watermark, moves).select_from(watermark.outerjoin(moves, true()))
+            ).all()
+            self._watermark = rows[0][0]
+            self._fold([row[1:] for row in rows if row[1] is not None])
+
+            # Products and locations written between the first reads and the snapshot
+            self._replay(start, upto=self._watermark, movements=False)
+            self._refresh_rows(np.arange(len(self.product_ids)))
+            self.loaded = True
+
+    def sync(self):
+        """Bring the matrix up to date with the database, loading it on first use."""
+        with self._lock:
+            if not self.loaded or self._current_epoch() != self._epoch:
+                # First use, or the log was dropped and recreated with the rest of the schema
+                self.load()
+                return
+            self._refresh_rows(self._replay(self._watermark))
+
+    def _replay(self, after, upto=None, movements=True):
+        """Apply log rows past `after` (up to `upto`); returns the product ordinals that changed."""
+        query = db.session.query(
+            StockLog.log_id, StockLog.kind, StockLog.product_id, StockLog.location_id,
+            StockLog.from_location, StockLog.to_location, StockLog.qty, StockLog.reorder_point
+        ).filter(StockLog.log_id > after)
+        if upto is not None:
+            query = query.filter(StockLog.log_id <= upto)
+        log = query.order_by(StockLog.log_id).all()
+        if not log:
+            return np.zeros(0, dtype=np.intp)
+
+        moves, reversals, changed = [], [], []
+        for _, kind, product_id, location_id, from_loc, to_loc, qty, reorder_point in log:
+            if kind == 'movement' and movements:
+                moves.append((product_id, from_loc, to_loc, qty))
+            elif kind == 'reversal' and movements:
+                reversals.append((product_id, from_loc, to_loc, -qty))
+            elif kind == 'product':
+                idx = self._product_ordinal(product_id)
+                self._set_reorder(idx, reorder_point)
+                changed.append(idx)
+            elif kind == 'location':
+                self._location_ordinal(location_id)
+        touched = np.union1d(self._fold(moves), self._fold(reversals, receive=False))
+        self._unstock({(r[0], r[2]) for r in reversals if r[2]})
+        self._watermark = max(self._watermark, log[-1][0])
+        return np.union1d(np.array(changed, dtype=np.intp), touched)
+
+    def _unstock(self, cells):
+        """Clear the stocked flag of cells whose last inbound movement was deleted."""
+        if not cells:
+            return
+        products, locations = {p for p, _ in cells}, {l for _, l in cells}
+        still_stocked = set(db.session.query(ProductMovement.product_id, ProductMovement.to_location).filter(
+            ProductMovement.product_id.in_(products), ProductMovement.to_location.in_(locations)
+        ).distinct())
+        for product_id, location_id in cells - still_stocked:
+            self._stocked[self._product_index[product_id], self._location_index[location_id]] = False
+
+    def _set_reorder(self, idx, reorder_point):
+        # The schema bounds reorder points; clamp anything older that slipped past it
+        self._reorder[idx] = min(max(int(reorder_point or 0), 0), MAX_QTY)
+
+    # ---------- ordinals ----------
+    def _grow(self, n_products, n_locations):
+        """Make room for at least the given number of rows and columns."""
+        rows, cols = self._balances.shape
+        if n_products <= rows and n_locations <= cols:
+            return
+        new_rows = max(n_products, rows + rows // 2, 16) if n_products > rows else rows
+        new_cols = max(n_locations, cols + cols // 2, 8) if n_locations > cols else cols
+        balances = np.zeros((new_rows, new_cols), dtype=np.int64)
+        stocked = np.zeros((new_rows, new_cols), dtype=bool)
+        balances[:rows, :cols] = self._balances
+        stocked[:rows, :cols] = self._stocked
+        self._balances, self._stocked = balances, stocked
+        if new_rows > rows:
+            self._reorder = np.concatenate([self._reorder, np.zeros(new_rows - rows, dtype=np.int64)])
+            self._row_min = np.concatenate([self._row_min, np.full(new_rows - rows, INT64_MAX, dtype=np.int64)])
+            self._row_short = np.concatenate([self._row_short, np.zeros(new_rows - rows, dtype=np.int64)])
+
+    def _product_ordinal(self, product_id):
+        idx = self._product_index.get(product_id)
+        if idx is None:
+            idx = len(self.product_ids)
+            self._grow(idx + 1, len(self.location_ids))
+            self._product_index[product_id] = idx
+            self.product_ids.append(product_id)
+        return idx
+
+    def _location_ordinal(self, location_id):
+        idx = self._location_index.get(location_id)
+        if idx is None:
+            idx = len(self.location_ids)
+            self._grow(len(self.product_ids), idx + 1)
+            self._location_index[location_id] = idx
+            self.location_ids.append(location_id)
+        return idx
+
+    def _lookup(self, product_id, location_id):
+        """Ordinals for a known product/location; -1 for a missing location."""
+        if product_id not in self._product_index:
+            raise ValueError(f'Unknown product: {product_id}')
+        if location_id and location_id not in self._location_index:
+            raise ValueError(f'Unknown location: {location_id}')
+        return self._product_index[product_id], self._location_index[location_id] if location_id else -1
+
+    # ---------- updates ----------
+    def _fold(self, movements, receive=True):
+        """Add (product_id, from_location, to_location, qty) rows to the matrix.
+
+        A cell counts as stocked once the product has been received there;
+        reversals of deleted movements pass receive=False and leave the flag
+        to `_unstock`. Returns the product ordinals that changed.
+        """
+        if not movements:
+            return np.zeros(0, dtype=np.intp)
+        n = len(movements)
+        p = np.fromiter((self._product_ordinal(m[0]) for m in movements), dtype=np.intp, count=n)
+        f = np.fromiter((self._location_ordinal(m[1]) if m[1] else -1 for m in movements), dtype=np.intp, count=n)
+        t = np.fromiter((self._location_ordinal(m[2]) if m[2] else -1 for m in movements), dtype=np.intp, count=n)
+        q = np.fromiter((int(m[3]) for m in movements), dtype=np.int64, count=n)
+
+        inbound, outbound = t >= 0, f >= 0
+        np.add.at(self._balances, (p[inbound], t[inbound]), q[inbound])
+        np.subtract.at(self._balances, (p[outbound], f[outbound]), q[outbound])
+        if receive:
+            self._stocked[p[inbound], t[inbound]] = True
+        return np.unique(p)
+
+    def _refresh_rows(self, rows):
+        """Recompute the per-product caches for the given product ordinals."""
+        n_l = len(self.location_ids)
+        for start in range(0, len(rows), ROW_CHUNK):
+            chunk = rows[start:start + ROW_CHUNK]
+            masked = np.where(self._stocked[chunk, :n_l], self._balances[chunk, :n_l], INT64_MAX)
+            reorder = self._reorder[chunk]
+            self._row_min[chunk] = masked.min(axis=1, initial=INT64_MAX)
+            short = np.count_nonzero(masked < reorder[:, None], axis=1)
+            self._row_short[chunk] = np.where(reorder > 0, short, 0)
+
+    # ---------- queries ----------
+    def _columns(self, location_ids):
+        """Location ordinals to scan, or None for every location."""
+        if location_ids is None:
+            return None
+        return np.array([self._location_index[l] for l in location_ids if l in self._location_index], dtype=np.intp)
+
+    def _candidate_rows(self):
+        """Products with at least one stocked cell under their reorder point."""
+        n_p = len(self.product_ids)
+        reorder = self._reorder[:n_p]
+        return np.flatnonzero((reorder > 0) & (self._row_min[:n_p] < reorder))
+
+    def _shortage(self, rows, cols):
+        """Reorder point minus balance for the given rows, zero where not stocked."""
+        cells = (rows, slice(0, len(self.location_ids))) if cols is None else np.ix_(rows, cols)
+        balances, stocked = self._balances[cells], self._stocked[cells]
+        return np.where(stocked, self._reorder[rows][:, None].astype(np.int64) - balances, 0)
+
+    def _rows(self, cols, p, l):
+        locations = l if cols is None else cols[l]
+        return [
+            {
+                'product_id': self.product_ids[pi],
+                'location_id': self.location_ids[li],
+                'qty': int(self._balances[pi, li]),
+                'reorder_point': int(self._reorder[pi]),
+                'shortage': int(self._reorder[pi] - self._balances[pi, li]),
+            }
+            for pi, li in zip(p.tolist(), locations.tolist())
+        ]
+
+    def _below_reorder(self, location_ids, limit):
+        cols = self._columns(location_ids)
+        rows = self._candidate_rows()
+        if cols is None:
+            counts = self._row_short[rows]
+        else:
+            counts = np.count_nonzero(self._shortage(rows, cols) > 0, axis=1)
+            rows, counts = rows[counts > 0], counts[counts > 0]
+        total = int(counts.sum())
+        if limit is not None:
+            # Only expand as many rows as needed to fill the page
+            rows = rows[:np.searchsorted(np.cumsum(counts), limit) + 1]
+        r, c = np.nonzero(self._shortage(rows, cols) > 0)
+        if limit is not None:
+            r, c = r[:limit], c[:limit]
+        return total, self._rows(cols, rows[r], c)
+
+    def _top_shortages(self, n, location_ids):
+        if n <= 0:
+            return []
+        cols = self._columns(location_ids)
+        rows = self._candidate_rows()
+        if cols is None:
+            row_max = self._reorder[rows].astype(np.int64) - self._row_min[rows]
+        else:
+            row_max = self._shortage(rows, cols).max(axis=1, initial=0)
+        # The n largest cells always lie within the n rows with the largest maximum
+        k_rows = min(n, int(np.count_nonzero(row_max > 0)))
+        if not k_rows:
+            return []
+        rows = rows[np.argpartition(row_max, row_max.size - k_rows)[-k_rows:]]
+        shortage = self._shortage(rows, cols)
+        candidates = shortage.ravel()
+        k = min(n, int(np.count_nonzero(candidates > 0)))
+        top = np.argpartition(candidates, candidates.size - k)[-k:]
+        top = top[np.argsort(candidates[top], kind='stable')[::-1]]
+        r, c = np.divmod(top, shortage.shape[1])
+        return self._rows(cols, rows[r], c)
+
+    def below_reorder(self, location_ids=None, limit=None):
+        """Stocked (product, location) cells whose balance is under the product's reorder point.
+
+        Returns (total count, rows) with rows ordered by product ordinal, then location.
+        """
+        with self._lock:
+            self.sync()
+            return self._below_reorder(location_ids, limit)
+
+    def top_shortages(self, n=20, location_ids=None):
+        """The n largest shortages below reorder point, biggest first."""
+        with self._lock:
+            self.sync()
+            return self._top_shortages(n, location_ids)
+
+    def summary(self, n=20, location_ids=None):
+        """Count of cells below reorder point and the n largest shortages, from one sync."""
+        with self._lock:
+            self.sync()
+            total, _ = self._below_reorder(location_ids, limit=0)
+            return total, self._top_shortages(n, location_ids)
+
+    def simulate(self, transfers):
+        """Apply a batch of hypothetical transfers without changing the matrix.
+
+        `transfers` is an iterable of (product_id, from_location, to_location, qty).
+        Returns one row per touched cell with its balance before and after,
+        flagging cells that would go negative or drop under the reorder point.
+        """
+        with self._lock:
+            self.sync()
+            transfers = list(transfers)
+            if not transfers:
+                return []
+            p, f, t, q = (np.empty(len(transfers), dtype=np.int64) for _ in range(4))
+            for i, (product_id, from_loc, to_loc, qty) in enumerate(transfers):
+                if not from_loc and not to_loc:
+                    raise ValueError(f'Transfer {i + 1}: specify a source or destination location')
+                if from_loc == to_loc:
+                    raise ValueError(f'Transfer {i + 1}: source and destination locations must differ')
+                p[i], f[i] = self._lookup(product_id, from_loc)
+                t[i] = self._lookup(product_id, to_loc)[1]
+                q[i] = qty
+
+            width = self._balances.shape[1]
+            out, into = f >= 0, t >= 0
+            cells = np.concatenate([p[out] * width + f[out], p[into] * width + t[into]])
+            deltas = np.concatenate([-q[out], q[into]])
+            cells, inverse = np.unique(cells, return_inverse=True)
+            delta = np.zeros(cells.size, dtype=np.int64)
+            np.add.at(delta, inverse, deltas)
+
+            before = self._balances.ravel()[cells].astype(np.int64)
+            after = before + delta
+            p_idx, l_idx = np.divmod(cells, width)
+            reorder = self._reorder[p_idx].astype(np.int64)
+            return [
+                {
+                    'product_id': self.product_ids[pi],
+                    'location_id': self.location_ids[li],
+                    'before': b,
+                    'after': a,
+                    'reorder_point': rp,
+                    'negative': a < 0,
+                    'below_reorder': rp > 0 and a < rp,
+                }
+                for pi, li, b, a, rp in zip(p_idx.tolist(), l_idx.tolist(), before.tolist(),
+                                            after.tolist(), reorder.tolist())
+            ]
+
+
+stock_engine = StockEngine()
@@ -0,0 +1,85 @@
+"""add stock log and reorder point bounds
+
+Revision ID: d5b8e13f6a27
+Revises: a41e6b90c7d3
+Create Date: 2026-10-19 16:41:08.213574
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5b8e13f6a27'
+down_revision = 'a41e6b90c7d3'
+branch_labels = None
+depends_on = None
+
+MAX_QTY = 2**31 - 1
+
+TRIGGERS = [
+    """CREATE TRIGGER stock_log_movement_insert AFTER INSERT ON product_movement BEGIN
+        INSERT INTO stock_log (kind, product_id, from_location, to_location, qty)
+        VALUES ('movement', NEW.product_id, NEW.from_location, NEW.to_location, NEW.qty);
+    END""",
+    """CREATE TRIGGER stock_log_movement_delete AFTER DELETE ON product_movement BEGIN
+        INSERT INTO stock_log (kind, product_id, from_location, to_location, qty)
+        VALUES ('reversal', OLD.product_id, OLD.from_location, OLD.to_location, OLD.qty);
+    END""",
+    """CREATE TRIGGER stock_log_movement_update
+    AFTER UPDATE OF product_id, from_location, to_location, qty ON product_movement BEGIN
+        INSERT INTO stock_log (kind, product_id, from_location, to_location, qty)
+        VALUES ('reversal', OLD.product_id, OLD.from_location, OLD.to_location, OLD.qty);
+        INSERT INTO stock_log (kind, product_id, from_location, to_location, qty)
+        VALUES ('movement', NEW.product_id, NEW.from_location, NEW.to_location, NEW.qty);
+    END""",
+    """CREATE TRIGGER stock_log_product_insert AFTER INSERT ON product BEGIN
+        INSERT INTO stock_log (kind, product_id, reorder_point)
+        VALUES ('product', NEW.product_id, NEW.reorder_point);
+    END""",
+    """CREATE TRIGGER stock_log_product_update AFTER UPDATE OF reorder_point ON product BEGIN
+        INSERT INTO stock_log (kind, product_id, reorder_point)
+        VALUES ('product', NEW.product_id, NEW.reorder_point);
+    END""",
+    """CREATE TRIGGER stock_log_product_delete AFTER DELETE ON product BEGIN
+        INSERT INTO stock_log (kind, product_id, reorder_point) VALUES ('product', OLD.product_id, 0);
+    END""",
+    """CREATE TRIGGER stock_log_location_insert AFTER INSERT ON location BEGIN
+        INSERT INTO stock_log (kind, location_id) VALUES ('location', NEW.location_id);
+    END""",
+]
+
+
+def upgrade():
+    op.execute(f'UPDATE product SET reorder_point = {MAX_QTY} WHERE reorder_point > {MAX_QTY}')
+    op.execute('UPDATE product SET reorder_point = 0 WHERE reorder_point < 0')
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_check_constraint('ck_product_reorder_point', f'reorder_point BETWEEN 0 AND {MAX_QTY}')
+
+    op.create_table('stock_log',
+    sa.Column('log_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('product_id', sa.String(length=10), nullable=True),
+    sa.Column('location_id', sa.String(length=32), nullable=True),
+    sa.Column('from_location', sa.String(length=32), nullable=True),
+    sa.Column('to_location', sa.String(length=32), nullable=True),
+    sa.Column('qty', sa.Integer(), nullable=True),
+    sa.Column('reorder_point', sa.Integer(), nullable=True),
+    sa.Column('token', sa.String(length=32), nullable=True),
+    sa.PrimaryKeyConstraint('log_id'),
+    sqlite_autoincrement=True
+    )
+    op.execute("INSERT INTO stock_log (kind, token) VALUES ('epoch', lower(hex(randomblob(16))))")
+    # Existing movements need no backfill: the engine loads balances from product_movement
+    for statement in TRIGGERS:
+        op.execute(statement)
+
+
+def downgrade():
+    for name in ('movement_insert', 'movement_delete', 'movement_update',
+                 'product_insert', 'product_update', 'product_delete', 'location_insert'):
+        op.execute(f'DROP TRIGGER IF EXISTS stock_log_{name}')
+    op.drop_table('stock_log')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_product_reorder_point', type_='check')
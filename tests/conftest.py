@@ -0,0 +1,59 @@
+import pytest
+
+from app import create_app, db
+from app.models import User, Product, Location, ProductMovement
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+    })
+    with app.app_context():
+        db.create_all()
+        user = User(username='tester')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'tester', 'password': 'secret'})
+    return client
+
+
+@pytest.fixture
+def add_product(app):
+    def add(name='Widget', reorder_point=0):
+        product = Product(name=name, reorder_point=reorder_point)
+        db.session.add(product)
+        db.session.commit()
+        return product.product_id
+    return add
+
+
+@pytest.fixture
+def add_location(app):
+    def add(name):
+        location = Location(name=name)
+        db.session.add(location)
+        db.session.commit()
+        return location.location_id
+    return add
+
+
+@pytest.fixture
+def move(app):
+    def add(product_id, from_location=None, to_location=None, qty=1):
+        movement = ProductMovement(product_id=product_id, from_location=from_location,
+                                   to_location=to_location, qty=qty)
+        db.session.add(movement)
+        db.session.commit()
+        return movement.movement_id
+    return add
@@ -0,0 +1,160 @@
+import random
+from collections import defaultdict
+
+from app import db
+from app.models import MAX_QTY, Product, Location, ProductMovement
+from app.stock_engine import StockEngine
+
+
+def recompute():
+    """Stocked cells under their reorder point, straight from the movement rows."""
+    balances, stocked = defaultdict(int), set()
+    for m in ProductMovement.query:
+        if m.to_location:
+            balances[m.product_id, m.to_location] += m.qty
+            stocked.add((m.product_id, m.to_location))
+        if m.from_location:
+            balances[m.product_id, m.from_location] -= m.qty
+    reorder = dict(db.session.query(Product.product_id, Product.reorder_point))
+    return sorted(
+        (p, l, balances[p, l], reorder[p])
+        for p, l in stocked if p in reorder and balances[p, l] < reorder[p]
+    )
+
+
+def check(engine):
+    total, rows = engine.below_reorder()
+    got = sorted((r['product_id'], r['location_id'], r['qty'], r['reorder_point']) for r in rows)
+    expected = recompute()
+    assert got == expected
+    assert total == len(expected)
+    top = engine.top_shortages(len(expected) + 5)
+    assert sorted((r['product_id'], r['location_id'], r['qty'], r['reorder_point']) for r in top) == expected
+    assert [r['shortage'] for r in top] == sorted((rp - qty for _, _, qty, rp in expected), reverse=True)
+
+
+def test_engine_follows_deleted_movements(app, add_product, add_location, move):
+    engine = StockEngine()
+    a = add_location('A')
+    p = add_product(reorder_point=10)
+    move(p, to_location=a, qty=50)
+    check(engine)
+    second = move(p, to_location=a, qty=5)
+    check(engine)
+    db.session.delete(db.session.get(ProductMovement, second))
+    db.session.commit()
+    move(p, from_location=a, qty=45)
+
+    _, rows = engine.below_reorder()
+    assert [(r['product_id'], r['location_id'], r['qty']) for r in rows] == [(p, a, 5)]
+    check(engine)
+
+
+def test_engine_survives_vacuum(app, add_product, add_location, move):
+    engine = StockEngine()
+    a, b = add_location('A'), add_location('B')
+    p = add_product(reorder_point=20)
+    ids = [move(p, to_location=a, qty=q) for q in (5, 6, 7, 8)]
+    check(engine)
+    for movement_id in ids[:3]:
+        db.session.delete(db.session.get(ProductMovement, movement_id))
+    db.session.commit()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql('VACUUM')
+    move(p, to_location=b, qty=3)
+    check(engine)
+
+
+def test_engine_matches_recompute_after_random_changes(app, add_product, add_location, move):
+    rng = random.Random(7)
+    engine = StockEngine()
+    locations = [add_location(f'L{i}') for i in range(4)]
+    products = [add_product(f'P{i}', reorder_point=rng.randint(0, 30)) for i in range(6)]
+
+    for step in range(120):
+        op = rng.random()
+        if op < 0.45:
+            src, dst = rng.sample(locations + [None], 2)
+            move(rng.choice(products), from_location=src, to_location=dst, qty=rng.randint(1, 25))
+        elif op < 0.65:
+            movement = ProductMovement.query.order_by(db.func.random()).first()
+            if movement:
+                db.session.delete(movement)
+                db.session.commit()
+        elif op < 0.75:
+            movement = ProductMovement.query.order_by(db.func.random()).first()
+            if movement:
+                movement.qty = rng.randint(1, 25)
+                movement.to_location = rng.choice(locations)
+                db.session.commit()
+        elif op < 0.95:
+            db.session.get(Product, rng.choice(products)).reorder_point = rng.randint(0, 30)
+            db.session.commit()
+        else:
+            locations.append(add_location(f'New{step}'))
+        check(engine)
+
+    check(StockEngine())
+
+
+def test_engine_sees_reorder_edits_that_cancel_out(app, add_product, add_location, move):
+    engine = StockEngine()
+    a = add_location('A')
+    products = [add_product(f'P{i}', reorder_point=5) for i in range(3)]
+    for p in products:
+        move(p, to_location=a, qty=5)
+    check(engine)
+    for p, delta in zip(products, (1, -2, 1)):
+        db.session.get(Product, p).reorder_point += delta
+    db.session.commit()
+    check(engine)
+
+
+def test_engine_keeps_balances_above_int32(app, add_product, add_location, move):
+    engine = StockEngine()
+    a = add_location('A')
+    p = add_product(reorder_point=MAX_QTY)
+    move(p, to_location=a, qty=MAX_QTY)
+    move(p, to_location=a, qty=MAX_QTY)
+    check(engine)
+
+    [cell] = engine.simulate([(p, a, None, MAX_QTY)])
+    assert (cell['before'], cell['after']) == (2 * MAX_QTY, MAX_QTY)
+    assert not cell['below_reorder']
+
+
+def test_engine_simulates_into_new_location(app, add_product, add_location, move):
+    engine = StockEngine()
+    a, b = add_location('A'), add_location('B')
+    p = add_product()
+    move(p, to_location=a, qty=4)
+    engine.sync()
+    db.session.delete(db.session.get(Location, b))
+    db.session.commit()
+    c = add_location('C')
+
+    [out, into] = sorted(engine.simulate([(p, a, c, 3)]), key=lambda cell: cell['location_id'] != a)
+    assert (out['before'], out['after'], into['location_id'], into['after']) == (4, 1, c, 3)
+
+
+def test_engine_reloads_when_schema_is_recreated(app, add_product, add_location, move):
+    engine = StockEngine()
+    a = add_location('A')
+    move(add_product(reorder_point=10), to_location=a, qty=3)
+    check(engine)
+
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    b = add_location('B')
+    p = add_product(reorder_point=4)
+    move(p, to_location=b, qty=1)
+    check(engine)
+    assert engine.location_ids == [b]
+
+
+def test_product_form_rejects_reorder_point_above_limit(client):
+    r = client.post('/products/add', data={'name': 'Widget', 'reorder_point': MAX_QTY + 1})
+
+    assert r.status_code == 200
+    assert Product.query.count() == 0
@@ -0,0 +1,65 @@
+from app import db
+from app.models import MAX_QTY, ProductMovement, Transfer
+
+
+def test_transfer_api_records_all_lines(client, add_product, add_location, move):
+    a, b = add_location('A'), add_location('B')
+    p1, p2 = add_product('One'), add_product('Two')
+    move(p1, to_location=a, qty=10)
+    move(p2, to_location=a, qty=10)
+
+    r = client.post('/api/transfers', json={
+        'from_location': a, 'to_location': b,
+        'lines': [{'product_id': p1, 'qty': 3}, {'product_id': p2, 'qty': 4}, {'product_id': p1, 'qty': 2}],
+    })
+
+    assert r.status_code == 201
+    transfer = db.session.get(Transfer, r.json['transfer_id'])
+    assert sorted((m.product_id, m.qty) for m in transfer.lines) == [(p1, 5), (p2, 4)]
+
+
+def test_transfer_api_rejects_insufficient_stock(client, add_product, add_location, move):
+    a, b = add_location('A'), add_location('B')
+    p = add_product()
+    move(p, to_location=a, qty=2)
+
+    r = client.post('/api/transfers', json={
+        'from_location': a, 'to_location': b, 'lines': [{'product_id': p, 'qty': 3}],
+    })
+
+    assert r.status_code == 400
+    assert 'Insufficient stock' in r.json['error']
+    assert Transfer.query.count() == 0
+    assert ProductMovement.query.count() == 1
+
+
+def test_transfer_api_rejects_merged_total_above_limit(client, add_product, add_location):
+    a = add_location('A')
+    p = add_product()
+
+    r = client.post('/api/transfers', json={
+        'to_location': a, 'lines': [{'product_id': p, 'qty': MAX_QTY}, {'product_id': p, 'qty': MAX_QTY}],
+    })
+
+    assert r.status_code == 400
+    assert ProductMovement.query.count() == 0
+
+
+def test_transfer_api_rejects_non_string_location(client, add_product):
+    p = add_product()
+
+    r = client.post('/api/transfers', json={'to_location': ['A'], 'lines': [{'product_id': p, 'qty': 1}]})
+
+    assert r.status_code == 400
+
+
+def test_transfer_form_rejects_quantity_above_limit(client, add_product, add_location):
+    a = add_location('A')
+    p = add_product()
+
+    r = client.post('/transfers/add', data={'to_location': a, 'from_location': '',
+                                            'lines': f'{p}, 99999999999999999999999'})
+
+    assert r.status_code == 200
+    assert f'quantity must be between 1 and {MAX_QTY}' in r.text
+    assert ProductMovement.query.count() == 0